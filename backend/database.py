@@ -1,6 +1,8 @@
+import asyncio
 import os
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import create_engine, insert, select, update, Column, Integer, String, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import sessionmaker, relationship, declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from datetime import datetime
 
 # Database URL Handling
@@ -12,11 +14,44 @@ if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
 # SQLAlchemy Setup
-connect_args = {"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-engine = create_engine(DATABASE_URL, connect_args=connect_args, pool_pre_ping=True, pool_recycle=300)
+# Explicit connection pool sizing for Postgres: SessionLocal()/close() then
+# checks connections in/out of the pool instead of paying a fresh TCP+TLS+auth
+# handshake per helper call. SQLite is a local file, so pool sizing is moot.
+if "sqlite" in DATABASE_URL:
+    connect_args = {"check_same_thread": False}
+    engine = create_engine(DATABASE_URL, connect_args=connect_args)
+else:
+    engine = create_engine(
+        DATABASE_URL,
+        pool_size=10,
+        max_overflow=20,
+        pool_timeout=30,
+        pool_pre_ping=True,
+        pool_recycle=1800,
+        executemany_mode="values_plus_batch",
+        executemany_values_page_size=1000,
+        future=True,
+    )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async engine for the background job. process_csv runs on the event loop
+# next to the SMTP coroutines, so its DB writes should be awaited rather
+# than pinning the loop for a full round trip. Postgres needs asyncpg,
+# SQLite needs aiosqlite; if the driver isn't installed the async helpers
+# below fall back to running the sync versions in a thread.
+if "sqlite" in DATABASE_URL:
+    ASYNC_DATABASE_URL = DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+else:
+    ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+try:
+    async_engine = create_async_engine(ASYNC_DATABASE_URL)
+    AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+except ImportError:
+    async_engine = None
+    AsyncSessionLocal = None
+
 # ORM Models
 class Job(Base):
     __tablename__ = "jobs"
@@ -29,14 +64,23 @@ class Job(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     completed_at = Column(DateTime, nullable=True)
 
-    emails = relationship("Email", back_populates="job", cascade="all, delete-orphan")
+    # lazy="raise" forbids accidental per-row lazy loads; fetch emails
+    # explicitly (e.g. select(Email).where(...) or selectinload(Job.emails)).
+    emails = relationship("Email", back_populates="job", cascade="all, delete-orphan", lazy="raise")
 
 class Email(Base):
     __tablename__ = "emails"
 
+    # Composite indexes matching the download/count query shapes
+    # (WHERE job_id = ? AND status/catch_all = ?)
+    __table_args__ = (
+        Index('ix_emails_job_status', 'job_id', 'status'),
+        Index('ix_emails_job_catchall', 'job_id', 'catch_all'),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     job_id = Column(String, ForeignKey("jobs.id"))
-    email = Column(String, index=True)
+    email = Column(String)
     status = Column(String)
     reason = Column(String, nullable=True)
     smtp_valid = Column(Boolean, default=False)
@@ -67,6 +111,10 @@ def init_db():
             print(f"INFO: Database connection attempt {attempt + 1}/{max_retries}...")
             # Create tables
             Base.metadata.create_all(bind=engine)
+            # create_all only adds indexes for brand-new tables; create them
+            # explicitly so existing deployments pick them up too.
+            for index in Email.__table__.indexes:
+                index.create(bind=engine, checkfirst=True)
             print("SUCCESS: Database initialized and tables verified.")
             return
         except Exception as e:
@@ -95,34 +143,44 @@ def create_job(job_id: str, filename: str, total_emails: int):
         db.close()
 
 def update_job_status(job_id: str, status: str):
+    # Single UPDATE statement; completed_at is computed in Python so there's
+    # no need to SELECT the row first.
     db = SessionLocal()
     try:
-        job = db.query(Job).filter(Job.id == job_id).first()
-        if job:
-            job.status = status
-            if status in ["COMPLETED", "FAILED", "CANCELLED"]:
-                job.completed_at = datetime.utcnow()
-            db.commit()
+        values = {"status": status}
+        if status in ["COMPLETED", "FAILED", "CANCELLED"]:
+            values["completed_at"] = datetime.utcnow()
+        db.execute(update(Job).where(Job.id == job_id).values(**values))
+        db.commit()
     finally:
         db.close()
 
 def update_job_progress(job_id: str, processed_count: int):
+    # Single UPDATE statement; no need to load the row just to set a counter.
     db = SessionLocal()
     try:
-        job = db.query(Job).filter(Job.id == job_id).first()
-        if job:
-            job.processed_emails = processed_count
-            db.commit()
+        db.execute(
+            update(Job).where(Job.id == job_id).values(processed_emails=processed_count)
+        )
+        db.commit()
     finally:
         db.close()
 
-def update_job_total(job_id: str, total: int):
+def upsert_job_total(job_id: str, total: int):
+    # Create-if-missing + set-total as one INSERT ... ON CONFLICT statement,
+    # so recording the parsed total never needs a SELECT first and works even
+    # if the job row hasn't been created yet.
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    stmt = dialect_insert(Job).values(
+        id=job_id, total_emails=total
+    ).on_conflict_do_update(index_elements=['id'], set_={'total_emails': total})
     db = SessionLocal()
     try:
-        job = db.query(Job).filter(Job.id == job_id).first()
-        if job:
-            job.total_emails = total
-            db.commit()
+        db.execute(stmt)
+        db.commit()
     finally:
         db.close()
 
@@ -143,6 +201,56 @@ def save_email_result(job_id: str, result: dict):
     finally:
         db.close()
 
+def _result_mappings(job_id: str, results: list):
+    return [
+        {
+            "job_id": job_id,
+            "email": r['email'],
+            "status": r['status'],
+            "reason": r.get('reason'),
+            "smtp_valid": bool(r.get('smtp_valid', False)),
+            "mx_found": bool(r.get('mx_found', False)),
+            "catch_all": bool(r.get('catch_all', False))
+        }
+        for r in results
+    ]
+
+def save_email_results_bulk(job_id: str, results: list):
+    # Bulk insert a whole batch of results in a single transaction.
+    # Much cheaper than one commit per row for large CSV jobs.
+    if not results:
+        return
+    db = SessionLocal()
+    try:
+        # insert() + executemany lets the driver emit one multi-row INSERT
+        # (execute_values on psycopg2) instead of row-by-row statements.
+        db.execute(insert(Email), _result_mappings(job_id, results))
+        db.commit()
+    finally:
+        db.close()
+
+async def save_email_results_bulk_async(job_id: str, results: list):
+    # Awaitable bulk insert for the background job.
+    if not results:
+        return
+    if AsyncSessionLocal is None:
+        await asyncio.to_thread(save_email_results_bulk, job_id, results)
+        return
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(Email), _result_mappings(job_id, results))
+        await db.commit()
+
+async def update_job_progress_async(job_id: str, processed_count: int):
+    # Awaitable progress write for the background job.
+    if AsyncSessionLocal is None:
+        await asyncio.to_thread(update_job_progress, job_id, processed_count)
+        return
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(Job).where(Job.id == job_id).values(processed_emails=processed_count)
+        )
+        await db.commit()
+
 def get_job(job_id: str):
     db = SessionLocal()
     try:
@@ -179,7 +287,7 @@ def get_job(job_id: str):
 def get_job_results(job_id: str):
     db = SessionLocal()
     try:
-        emails = db.query(Email).filter(Email.job_id == job_id).all()
+        emails = db.execute(select(Email).where(Email.job_id == job_id)).scalars().all()
         # Convert to list of dicts
         return [
             {
@@ -194,3 +302,23 @@ def get_job_results(job_id: str):
         ]
     finally:
         db.close()
+
+def stream_job_results(job_id: str):
+    # Generator over results using a server-side cursor (yield_per), so
+    # large result sets never have to fit in memory at once.
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            select(Email).where(Email.job_id == job_id).execution_options(yield_per=1000)
+        ).scalars()
+        for e in result:
+            yield {
+                "email": e.email,
+                "status": e.status,
+                "reason": e.reason,
+                "smtp_valid": e.smtp_valid,
+                "mx_found": e.mx_found,
+                "catch_all": e.catch_all
+            }
+    finally:
+        db.close()
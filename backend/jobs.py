@@ -1,8 +1,16 @@
 # import pandas as pd (Moved to function)
 import asyncio
+import json
+import os
+import time
 from typing import List
 from verifier import EmailVerifier
-from database import update_job_status, update_job_progress, save_email_result, update_job_total
+from database import (
+    update_job_status,
+    upsert_job_total,
+    update_job_progress_async,
+    save_email_results_bulk_async,
+)
 import logging
 
 
@@ -22,11 +30,12 @@ async def process_csv(job_id: str, file_path: str):
     Background task to process the CSV file.
     """
     logger.info(f"STARTING JOB EXECUTION: {job_id} for file {file_path}")
-    print(f"DEBUG_JOBS: Starting job {job_id}")
-    
+
     try:
-        update_job_status(job_id, "PROCESSING")
+        await asyncio.to_thread(update_job_status, job_id, "PROCESSING")
     
+        # Uses the process-wide MX / catch-all caches, so back-to-back jobs
+        # benefit from each other's DNS and catch-all work.
         verifier = EmailVerifier()
         # Read just the header first to find the email column
         # This avoids loading the entire huge file into memory if we just need one column
@@ -36,7 +45,7 @@ async def process_csv(job_id: str, file_path: str):
         # Normalize headers to map {clean_name: original_name}
         # e.g. {'email': 'Email', 'fullname': 'fullName'}
         header_map = {c.lower().strip(): c for c in df_header.columns}
-        print(f"DEBUG: File Headers Detected: {list(header_map.keys())}")
+        logger.debug(f"File headers detected: {list(header_map.keys())}")
         
         # Try to find 'email' as an exact match first
         email_col_name = header_map.get('email')
@@ -52,81 +61,142 @@ async def process_csv(job_id: str, file_path: str):
                      break
         
         if not email_col_name:
-            print(f"FAILED: Job {job_id} - No email column found in {list(header_map.keys())}")
             logger.error(f"Job {job_id} failed: No 'email' column found in {list(header_map.keys())}")
-            update_job_status(job_id, "FAILED")
+            await asyncio.to_thread(update_job_status, job_id, "FAILED")
             return
 
         # Now read ONLY the email column
-        print(f"DEBUG: Found email column '{email_col_name}' among headers {list(header_map.keys())} in {file_path}")
         logger.info(f"Reading column '{email_col_name}' from {file_path}")
         
+        def read_email_column(encoding=None):
+            kwargs = {"usecols": [email_col_name]}
+            if encoding:
+                kwargs["encoding"] = encoding
+            try:
+                # PyArrow's multithreaded parser is several times faster than
+                # the default C engine and stores strings contiguously
+                return pd.read_csv(file_path, engine="pyarrow", dtype_backend="pyarrow", **kwargs)
+            except ImportError:
+                # pyarrow not installed, fall back to the default engine
+                return pd.read_csv(file_path, **kwargs)
+
         # OFF-LOAD BLOCKING I/O TO THREAD
-        print(f"DEBUG: Attempting to read CSV {file_path} with column {email_col_name}")
         try:
             # Try reading with default encoding
-            df = await asyncio.to_thread(pd.read_csv, file_path, usecols=[email_col_name])
-        except UnicodeDecodeError:
-            print(f"DEBUG: Default encoding failed, trying utf-8-sig")
-            # Fallback for Excel-saved CSVs
-            df = await asyncio.to_thread(pd.read_csv, file_path, usecols=[email_col_name], encoding='utf-8-sig')
+            df = await asyncio.to_thread(read_email_column)
+        except (UnicodeDecodeError, ValueError):
+            logger.debug("Default encoding failed, trying utf-8-sig")
+            # Fallback for Excel-saved CSVs (pyarrow raises ValueError on bad UTF-8)
+            df = await asyncio.to_thread(read_email_column, 'utf-8-sig')
         except Exception as read_err:
-             print(f"CRITICAL: Failed to read CSV file: {read_err}")
+             logger.error(f"Failed to read CSV file: {read_err}")
              raise read_err
         
         # Standardize the column name in our dataframe to 'email' for internal use
         df = df.rename(columns={email_col_name: 'email'})
 
-        emails = df['email'].astype(str).tolist()
+        col = df['email']
+        if not pd.api.types.is_string_dtype(col):
+            col = col.astype(str)
+        # String/arrow columns: to_numpy(object) hands back the existing str
+        # objects without running str() once per row like astype(str) did.
+        emails = col.fillna("").to_numpy(dtype=object, copy=False).tolist()
         total = len(emails)
         
-        print(f"DEBUG: Job {job_id} - Total emails to process: {total}")
 
         # Update total count in DB now that we've parsed it
-        update_job_total(job_id, total)
-        
-        # Chunk processing to allow for some concurrency control
-        # We can use asyncio.gather for concurrency
-        BATCH_SIZE = 50 # Increased concurrency limit for faster processing
-        
-        for i in range(0, total, BATCH_SIZE):
-            batch = emails[i : i + BATCH_SIZE]
-            tasks = [verifier.verify(email) for email in batch]
-            # Use return_exceptions=True so one bad email doesn't crash the whole batch
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            for idx, res in enumerate(results):
-                if isinstance(res, Exception):
-                    # Log the exception and save a failure result
-                    failed_email = batch[idx]
-                    logger.error(f"Error verifying {failed_email}: {res}")
-                    print(f"CRITICAL: Failed to verify {failed_email}: {res}")
-                    save_email_result(job_id, {
-                        "email": failed_email,
+        await asyncio.to_thread(upsert_job_total, job_id, total)
+
+        # Deduplicate before verifying: duplicate addresses are common in real
+        # lists and each one would repeat the full DNS+SMTP round trip. We
+        # verify each normalized address once and fan the result back out to
+        # every original occurrence.
+        occurrences = {}
+        for e in emails:
+            occurrences.setdefault(e.strip().lower(), []).append(e)
+        unique_emails = list(occurrences)
+        logger.info(f"Job {job_id}: {total} emails, {len(unique_emails)} unique")
+
+        # Sliding-window concurrency: a semaphore keeps CONCURRENCY
+        # verifications in flight and new ones launch the moment a slot
+        # frees, so one slow SMTP handshake no longer stalls a whole batch.
+        CONCURRENCY = 50
+        SAVE_CHUNK = 500  # rows buffered before each bulk insert
+
+        # Throttle progress writes: at most ~1/second keeps the UI responsive
+        # without hammering the DB once per batch on huge jobs.
+        PROGRESS_INTERVAL = 1.0  # seconds
+        last_progress_time = time.monotonic()
+
+        sem = asyncio.Semaphore(CONCURRENCY)
+
+        async def verify_bounded(email):
+            async with sem:
+                try:
+                    return await verifier.verify(email)
+                except Exception as exc:
+                    # One bad email shouldn't crash the whole job
+                    logger.error(f"Error verifying {email}: {exc}")
+                    return {
+                        "email": email,
                         "status": "ERROR",
-                        "reason": f"Verification Crash: {str(res)}",
+                        "reason": f"Verification Crash: {str(exc)}",
                         "smtp_valid": False,
                         "mx_found": False,
                         "catch_all": False
-                    })
-                else:
-                    save_email_result(job_id, res)
-            
-            # Update progress
-            processed = min(i + BATCH_SIZE, total)
-            
-            # Log a sample result for debugging
-            if results and isinstance(results[0], dict):
-                 sample = results[0]
-                 print(f"DEBUG: Sample Result for {sample.get('email')}: {sample.get('status')} - {sample.get('reason')}")
-            
-            print(f"DEBUG: Job {job_id} progress: {processed}/{total}")
-            update_job_progress(job_id, processed)
-            
-        update_job_status(job_id, "COMPLETED")
+                    }
+
+        tasks = [asyncio.create_task(verify_bounded(e)) for e in unique_emails]
+
+        processed = 0
+        buffer = []
+        for fut in asyncio.as_completed(tasks):
+            res = await fut
+            # Fan the unique result back out to every original occurrence
+            for original in occurrences[res["email"]]:
+                row = dict(res)
+                row["email"] = original
+                buffer.append(row)
+            processed += len(occurrences[res["email"]])
+
+            if len(buffer) >= SAVE_CHUNK:
+                await save_email_results_bulk_async(job_id, buffer)
+                buffer.clear()
+
+            logger.debug(f"Job {job_id} progress: {processed}/{total}")
+            now = time.monotonic()
+            if processed == total or now - last_progress_time > PROGRESS_INTERVAL:
+                await update_job_progress_async(job_id, processed)
+                last_progress_time = now
+
+        if buffer:
+            await save_email_results_bulk_async(job_id, buffer)
+
+        # Shut down the pooled SMTP connections now that the job is done
+        await verifier.close()
+
+        # Persist the parsed rows + detected email column so the 'cleaned'
+        # download can filter the original data without re-parsing the CSV
+        # or re-running column detection.
+        try:
+            def write_sidecars():
+                upload_dir = os.path.dirname(file_path)
+                try:
+                    original_df = pd.read_csv(file_path)
+                except UnicodeDecodeError:
+                    original_df = pd.read_csv(file_path, encoding='latin-1')
+                original_df.to_parquet(os.path.join(upload_dir, f"{job_id}_orig.parquet"))
+                with open(os.path.join(upload_dir, f"{job_id}_meta.json"), "w") as f:
+                    json.dump({"email_col": email_col_name}, f)
+
+            await asyncio.to_thread(write_sidecars)
+        except Exception as sidecar_err:
+            # Non-fatal: the download endpoint falls back to re-parsing the CSV
+            logger.warning(f"Job {job_id}: could not write parquet sidecar: {sidecar_err}")
+
+        await asyncio.to_thread(update_job_status, job_id, "COMPLETED")
         logger.info(f"Job {job_id} completed")
 
     except Exception as e:
         logger.error(f"CRITICAL ERROR in job {job_id}: {e}", exc_info=True)
-        print(f"DEBUG_JOBS: Job {job_id} failed with error: {e}")
-        update_job_status(job_id, "FAILED")
+        await asyncio.to_thread(update_job_status, job_id, "FAILED")
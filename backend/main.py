@@ -1,17 +1,26 @@
 from fastapi import FastAPI, UploadFile, File, BackgroundTasks, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+import asyncio
 import shutil
+import csv
+import io
+import json
 import os
 import uuid
 from datetime import datetime
 # import pandas as pd (Moved to functions to speed up startup)
 from typing import List
-from database import init_db, create_job, get_job, get_job_results
+from database import init_db, create_job, get_job, get_job_results, stream_job_results
 from jobs import process_csv
 from models import JobResponse
+import logging
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+# orjson serializes responses (incl. datetimes) several times faster than
+# stdlib json; matters most for the /job/{id} polling endpoint.
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # CORS
 origins = [
@@ -41,7 +50,7 @@ if not os.path.exists(UPLOAD_DIR):
 try:
     init_db()
 except Exception as e:
-    print(f"CRITICAL ERROR: Failed to initialize database on startup: {e}")
+    logger.error(f"Failed to initialize database on startup: {e}")
     # We continue so uvicorn can at least start, but subsequent DB calls will fail.
     # This is better than a hard crash during import on some platforms.
 
@@ -50,28 +59,31 @@ def read_root():
     return {"message": "Email Verifier API is running"}
 
 @app.post("/upload", response_model=JobResponse)
-def upload_file(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
-    print(f"DEBUG_UPLOAD: Received upload request for {file.filename}")
+async def upload_file(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+    logger.debug(f"Received upload request for {file.filename}")
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Only CSV files are allowed")
-    
+
     job_id = str(uuid.uuid4())
     file_path = os.path.join(UPLOAD_DIR, f"{job_id}_{file.filename}")
+
+
+    def save_upload():
+        # 1 MiB buffer: far fewer Python-level read/write cycles than the
+        # default 64 KiB for large CSVs
+        with open(file_path, "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer, length=1024 * 1024)
+
+    # Run the copy in a thread so the event loop isn't blocked by disk I/O
+    await asyncio.to_thread(save_upload)
     
-    print(f"DEBUG_UPLOAD: Saving file to {file_path}")
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    print(f"DEBUG_UPLOAD: File saved successfully. Size: {os.path.getsize(file_path)} bytes")
-    
-    # Initial Job Creation (Total emails set to 0, updated in background)
+    # Initial Job Creation (Total emails set to 0, updated in background).
+    # Blocking DB round trip, so keep it off the event loop like the copy.
     total_emails = 0
-    print(f"DEBUG_UPLOAD: Creating DB entry for job {job_id}")
-    create_job(job_id, file.filename, total_emails)
-    print(f"DEBUG_UPLOAD: DB entry created.")
+    await asyncio.to_thread(create_job, job_id, file.filename, total_emails)
     
     # Trigger background task
     background_tasks.add_task(process_csv, job_id, file_path)
-    print(f"DEBUG_UPLOAD: Background task scheduled. Returning response.")
     
     return {
         "id": job_id,
@@ -86,37 +98,73 @@ def upload_file(background_tasks: BackgroundTasks, file: UploadFile = File(...))
         "created_at": datetime.now()
     }
 
-@app.get("/job/{job_id}", response_model=JobResponse)
+# No response_model here: the frontend polls this endpoint for the whole
+# lifetime of a job, and get_job already returns the exact JobResponse
+# shape, so re-validating it through pydantic on every poll is pure cost.
+@app.get("/job/{job_id}")
 def get_job_status(job_id: str):
     job = get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     return job
 
+def stream_dataframe_csv(df, filename: str):
+    # Serialize straight into the response body in chunks: no derived file
+    # left in the upload dir, and the first bytes go out immediately.
+    def iter_csv():
+        buf = io.StringIO()
+        df.to_csv(buf, index=False)
+        buf.seek(0)
+        while chunk := buf.read(65536):
+            yield chunk
+
+    return StreamingResponse(
+        iter_csv(),
+        media_type='text/csv',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
 @app.get("/job/{job_id}/download/{type}")
 def download_results(job_id: str, type: str):
     job = get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    results = get_job_results(job_id)
-    if not results:
-         raise HTTPException(status_code=404, detail="No results found")
-    
-    # Convert DB results to DataFrame
-    import pandas as pd
-    results_df = pd.DataFrame(results)
-    
     # Path to original file
     original_file_path = os.path.join(UPLOAD_DIR, f"{job_id}_{job['filename']}")
-    
+
     if type == 'cleaned':
+        results = get_job_results(job_id)
+        if not results:
+             raise HTTPException(status_code=404, detail="No results found")
+
+        import pandas as pd
+
         # Logic for Cleaned List: Return original rows where status is VALID
-        output_file = os.path.join(UPLOAD_DIR, f"{job_id}_cleaned.csv")
-        
+        parquet_path = os.path.join(UPLOAD_DIR, f"{job_id}_orig.parquet")
+        meta_path = os.path.join(UPLOAD_DIR, f"{job_id}_meta.json")
+
+        # Fast path: process_csv already parsed the original file to parquet
+        # and recorded the email column, so skip re-parsing and detection.
+        if os.path.exists(parquet_path) and os.path.exists(meta_path):
+            try:
+                original_df = pd.read_parquet(parquet_path)
+                with open(meta_path) as f:
+                    email_col = json.load(f)["email_col"]
+
+                valid = {r['email'].strip().lower() for r in results if r['status'] == 'VALID'}
+                mask = original_df[email_col].astype(str).str.lower().str.strip().isin(valid)
+                cleaned_df = original_df[mask]
+
+                return stream_dataframe_csv(cleaned_df, f"cleaned_{job['filename']}")
+            except Exception as e:
+                logger.warning(f"Error using parquet sidecar, falling back to CSV: {e}")
+
+        # Fallback: re-parse the original CSV (jobs processed before the
+        # sidecar existed, or sidecar write failed)
         if not os.path.exists(original_file_path):
              raise HTTPException(status_code=404, detail="Original file not found")
-        
+
         try:
             # multiple encodings to handle various CSV types
             try:
@@ -124,76 +172,94 @@ def download_results(job_id: str, type: str):
             except UnicodeDecodeError:
                 original_df = pd.read_csv(original_file_path, encoding='latin-1')
 
-            # normalize column names for search
-            original_columns = original_df.columns.tolist()
-            
-            # Find the email column
+            # Find the email column: prefer the one process_csv already
+            # detected (meta sidecar), then column-name matching, then the
+            # column with the most '@' symbols.
             email_col = None
-            for col in original_columns:
-                if 'email' in col.lower() or 'e-mail' in col.lower() or 'mail' in col.lower():
-                    email_col = col
-                    break
-            
+            if os.path.exists(meta_path):
+                try:
+                    with open(meta_path) as f:
+                        recorded = json.load(f)["email_col"]
+                    if recorded in original_df.columns:
+                        email_col = recorded
+                except Exception as e:
+                    logger.warning(f"Error reading meta sidecar: {e}")
+
             if not email_col:
-                # If no clear email column, assume first column? Or fail?
-                # Let's try to assume the column with largest number of '@' symbols
-                max_at_count = 0
-                for col in original_columns:
-                    if original_df[col].dtype == 'object':
-                        at_count = original_df[col].str.count('@').sum()
-                        if at_count > max_at_count:
-                            max_at_count = at_count
-                            email_col = col
+                for col in original_df.columns:
+                    if 'email' in col.lower() or 'e-mail' in col.lower() or 'mail' in col.lower():
+                        email_col = col
+                        break
+
+            if not email_col:
+                # If no clear email column, assume the one with the largest
+                # number of '@' symbols (vectorized, one pass per object column)
+                object_df = original_df.select_dtypes(include='object')
+                if not object_df.empty:
+                    at_counts = object_df.apply(lambda s: s.str.count('@').sum())
+                    if at_counts.max() > 0:
+                        email_col = at_counts.idxmax()
 
             if not email_col:
                  raise HTTPException(status_code=400, detail="Could not identify email column in original file")
 
-            # Prepare for merge
-            # Create a normalized temporary column for joining
-            original_df['_email_normalized'] = original_df[email_col].astype(str).str.lower().str.strip()
-            results_df['_email_normalized'] = results_df['email'].astype(str).str.lower().str.strip()
-            
-            # Rename backend status to avoid collision if original file has a 'status' column
-            results_df_merge = results_df[['_email_normalized', 'status']].rename(columns={'status': '_backend_status'})
-            
-            # Merge to get status
-            merged_df = pd.merge(original_df, results_df_merge, on='_email_normalized', how='left')
-            
-            # Filter: Keep ONLY valid emails
-            cleaned_df = merged_df[merged_df['_backend_status'] == 'VALID'].copy()
-            
-            # Drop the helper columns and the status column (since user just wants original format)
-            cleaned_df = cleaned_df.drop(columns=['_email_normalized', '_backend_status'])
-            
-            # Save
-            cleaned_df.to_csv(output_file, index=False)
-            return FileResponse(output_file, media_type='text/csv', filename=f"cleaned_{job['filename']}")
+            # Filter: Keep ONLY valid emails. Membership in a hash set is all
+            # we need here, so skip the merge (and its helper columns) entirely.
+            valid = {r['email'].strip().lower() for r in results if r['status'] == 'VALID'}
+            mask = original_df[email_col].astype(str).str.lower().str.strip().isin(valid)
+            cleaned_df = original_df[mask]
+
+            return stream_dataframe_csv(cleaned_df, f"cleaned_{job['filename']}")
 
         except Exception as e:
-            print(f"Error generating cleaned list: {e}")
+            logger.error(f"Error generating cleaned list: {e}")
             raise HTTPException(status_code=500, detail=f"Error generating cleaned list: {str(e)}")
 
     else:
-        # Standard segmented downloads (results only)
-        df = results_df
-        
-        # Segment data
-        if type == 'valid':
-            filtered_df = df[df['status'] == 'VALID']
-        elif type == 'invalid':
-            filtered_df = df[df['status'] == 'INVALID']
-        elif type == 'catch_all':
-            filtered_df = df[df['catch_all'] == 1]
-        elif type == 'risky':
-            # Risky = Unknown + Catch All
-            filtered_df = df[(df['status'] == 'UNKNOWN') | (df['catch_all'] == 1)]
-        else: # all
-            filtered_df = df
-            
-        output_file = os.path.join(UPLOAD_DIR, f"{job_id}_{type}.csv")
-        filtered_df.to_csv(output_file, index=False)
-        
-        return FileResponse(output_file, media_type='text/csv', filename=f"{type}_emails.csv")
+        # Standard segmented downloads (results only), streamed straight from
+        # the DB so we never materialize the full result set in memory or on disk.
+        def row_matches(row):
+            if type == 'valid':
+                return row['status'] == 'VALID'
+            elif type == 'invalid':
+                return row['status'] == 'INVALID'
+            elif type == 'catch_all':
+                return bool(row['catch_all'])
+            elif type == 'risky':
+                # Risky = Unknown + Catch All
+                return row['status'] == 'UNKNOWN' or bool(row['catch_all'])
+            return True  # all
+
+        rows = stream_job_results(job_id)
+        try:
+            first_row = next(rows)
+        except StopIteration:
+            raise HTTPException(status_code=404, detail="No results found")
+
+        def iter_csv():
+            import itertools
+            buf = io.StringIO()
+            writer = csv.DictWriter(
+                buf,
+                fieldnames=["email", "status", "reason", "smtp_valid", "mx_found", "catch_all"]
+            )
+            writer.writeheader()
+            for row in itertools.chain([first_row], rows):
+                if not row_matches(row):
+                    continue
+                writer.writerow(row)
+                # Flush in ~64KB chunks
+                if buf.tell() > 65536:
+                    yield buf.getvalue()
+                    buf.seek(0)
+                    buf.truncate(0)
+            yield buf.getvalue()
+
+        return StreamingResponse(
+            iter_csv(),
+            media_type='text/csv',
+            headers={'Content-Disposition': f'attachment; filename="{type}_emails.csv"'}
+        )
 
 if __name__ == "__main__":
     import uvicorn
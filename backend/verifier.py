@@ -1,13 +1,17 @@
 import re
+import gzip
 import dns.resolver
+import dns.asyncresolver
+import dns.exception
 import aiosmtplib
 import asyncio
 import random
-import string
 import socket
+from collections import OrderedDict, defaultdict
 import os
+import time
 import logging
-from typing import Tuple, Optional, Dict, List
+from typing import ClassVar, Tuple, Optional, Dict, List
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -15,107 +19,588 @@ logger = logging.getLogger(__name__)
 # Constants
 SMTP_PORT = 25
 TIMEOUT = 10  # Seconds
+MAX_MX_TTL = 3600  # Cap on how long a positive MX answer may be reused (seconds)
+NEGATIVE_MX_TTL = 60  # How long to remember NXDOMAIN / no-MX verdicts (seconds)
+# Transient codes worth one retry: greylisting and temporary local errors
+TRANSIENT_SMTP_CODES = {421, 450, 451, 452}
 SENDER_EMAIL = os.getenv("VERIFIER_SENDER_EMAIL", "verify@check-email-status.com")
+# Pre-encoded once: the pipelined paths write this on every probe
+MAIL_FROM_LINE = f"MAIL FROM:<{SENDER_EMAIL}>\r\n".encode("ascii")
 
-# Common Disposable Domains (Expanded list would be better in a DB/File)
-DISPOSABLE_DOMAINS = {
+# Common Disposable Domains, extendable via DISPOSABLE_DOMAINS_FILE (one
+# domain per line, optionally gzipped — e.g. the disposable-email-domains
+# list). Stored lowercase; callers pass lowercased input.
+DISPOSABLE_DOMAINS = frozenset({
     "mailinator.com", "yopmail.com", "temp-mail.org", "guerrillamail.com",
     "10minutemail.com", "throwawaymail.com", "fakeinbox.com", "getairmail.com"
-}
+})
+
+def _load_disposable_domains() -> frozenset:
+    domains = set(DISPOSABLE_DOMAINS)
+    path = os.getenv("DISPOSABLE_DOMAINS_FILE")
+    if path:
+        try:
+            opener = gzip.open if path.endswith(".gz") else open
+            with opener(path, "rt") as f:
+                domains.update(line.strip().lower() for line in f if line.strip())
+        except OSError as e:
+            logger.warning(f"Could not load disposable domain list {path}: {e}")
+    return frozenset(domains)
+
+def _build_disposable_trie(domains) -> dict:
+    # Trie keyed by reversed labels, so foo.mailinator.com matches the
+    # mailinator.com entry in O(labels) dict lookups regardless of list size.
+    trie: dict = {}
+    for domain in domains:
+        node = trie
+        for label in reversed(domain.split('.')):
+            node = node.setdefault(label, {})
+        node["_leaf"] = True
+    return trie
+
+_DISPOSABLE_TRIE = _build_disposable_trie(_load_disposable_domains())
+
+# Compiled once: skips the per-call pattern-cache lookup, and \Z (unlike $)
+# doesn't accept a trailing newline.
+EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}\Z')
 
 # Role-based prefixes
-ROLE_PREFIXES = {
-    "admin", "support", "info", "contact", "sales", "marketing", "billing", 
+ROLE_PREFIXES = frozenset({
+    "admin", "support", "info", "contact", "sales", "marketing", "billing",
     "abuse", "postmaster", "webmaster", "jobs", "hr", "noreply", "no-reply"
+})
+
+# MX hosts for the consumer domains that dominate real mailing lists,
+# preloaded into the shared cache so they never cost a DNS query while
+# the entries are fresh.
+WELL_KNOWN_MX = {
+    "gmail.com": ["gmail-smtp-in.l.google.com"],
+    "googlemail.com": ["gmail-smtp-in.l.google.com"],
+    "outlook.com": ["outlook-com.olc.protection.outlook.com"],
+    "hotmail.com": ["hotmail-com.olc.protection.outlook.com"],
+    "live.com": ["live-com.olc.protection.outlook.com"],
+    "yahoo.com": ["mta5.am0.yahoodns.net"],
+    "icloud.com": ["mx01.mail.icloud.com"],
 }
 
+class _LRUCache(OrderedDict):
+    """Dict with a size cap; least-recently-used entries are evicted.
+
+    Keeps long-running verifier processes from growing one cache entry per
+    unique domain ever seen.
+    """
+
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
+
+def _preloaded_mx_cache() -> _LRUCache:
+    cache = _LRUCache(50_000)
+    for domain, hosts in WELL_KNOWN_MX.items():
+        cache[domain] = (time.monotonic() + MAX_MX_TTL, hosts)
+    return cache
+
 class EmailVerifier:
-    def __init__(self):
-        self.resolver = dns.resolver.Resolver()
+    # Shared across instances so MX lookups and catch-all verdicts stay warm
+    # between jobs in the same process. Callers can still inject their own
+    # mappings through __init__ if they need isolation.
+    _shared_mx_cache: ClassVar[Dict[str, tuple]] = _preloaded_mx_cache()
+    _shared_catch_all_cache: ClassVar[Dict[str, bool]] = _LRUCache(10_000)
+
+    def __init__(self, mx_cache: Optional[Dict[str, List[str]]] = None,
+                 catch_all_cache: Optional[Dict[str, bool]] = None):
+        # Async resolver drives the DNS socket on the event loop directly:
+        # no thread hop per query and no executor-size concurrency cap.
+        self.resolver = dns.asyncresolver.Resolver()
         self.resolver.nameservers = ['8.8.8.8', '1.1.1.1', '8.8.4.4']
         self.resolver.lifetime = TIMEOUT
         self.resolver.timeout = TIMEOUT
-        self.mx_cache: Dict[str, List[str]] = {}
-        self.catch_all_cache: Dict[str, bool] = {}
+        # Caches can be injected so a caller can isolate or inspect them;
+        # the default is the process-wide shared cache above.
+        self.mx_cache = mx_cache if mx_cache is not None else EmailVerifier._shared_mx_cache
+        self.catch_all_cache = catch_all_cache if catch_all_cache is not None else EmailVerifier._shared_catch_all_cache
+        # Pool of live SMTP connections keyed by MX host. The TCP+EHLO
+        # handshake dominates per-probe wall time, so connections are reused
+        # across verifications (and across catch-all + real-address probes).
+        self.smtp_pool: Dict[str, asyncio.Queue] = {}
+        # Catch-all probes only need to be unlikely to collide with a real
+        # mailbox: one urandom draw per process plus a counter is enough,
+        # with zero syscalls per probe.
+        self._probe_base = os.urandom(8).hex()
+        self._probe_n = 0
+        # Shared backoff deadline per MX so concurrent probes that all hit
+        # greylisting don't stack into a retry storm
+        self._greylist_until: Dict[str, float] = {}
+        # EHLO capabilities per MX host; they practically never change, so
+        # reconnects reuse them instead of re-probing (see _acquire_smtp).
+        self._ehlo_cache: Dict[str, Dict[str, str]] = {}
+        # Prefetched A records per MX host: (expiry, ip). Connecting by IP
+        # skips the serial getaddrinfo lookup inside open_connection.
+        self._mx_ip: Dict[str, tuple] = _LRUCache(10_000)
+        # In-flight lookups keyed by domain: concurrent verifies for the same
+        # domain await one DNS query / catch-all probe instead of racing N.
+        self._mx_inflight: Dict[str, asyncio.Future] = {}
+        self._catch_all_inflight: Dict[str, asyncio.Future] = {}
+
+    async def _acquire_smtp(self, mx_server: str) -> aiosmtplib.SMTP:
+        """Get a live connection to mx_server from the pool, or open a new one."""
+        queue = self.smtp_pool.setdefault(mx_server, asyncio.Queue())
+        while True:
+            try:
+                smtp = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            try:
+                # RSET doubles as a liveness check and clears any prior transaction
+                await smtp.rset()
+                return smtp
+            except Exception:
+                await self._discard_smtp(smtp)
+        # With start_tls unset, connect() issues its own EHLO to probe for
+        # STARTTLS support. Once we've seen this MX's capabilities, pass the
+        # answer explicitly so that probe EHLO is skipped; the one EHLO the
+        # protocol requires still happens below when connect() didn't do it.
+        cached = self._ehlo_cache.get(mx_server)
+        kwargs = {}
+        if cached is not None:
+            kwargs["start_tls"] = "starttls" in cached
+        # Connect straight to the prefetched IP when we know the session will
+        # stay plaintext; with STARTTLS in play the hostname must be used so
+        # certificate validation can succeed.
+        connect_host = mx_server
+        if cached is not None and "starttls" not in cached:
+            entry = self._mx_ip.get(mx_server)
+            if entry and entry[0] > time.monotonic():
+                connect_host = entry[1]
+        smtp = aiosmtplib.SMTP(hostname=connect_host, port=SMTP_PORT, timeout=TIMEOUT, **kwargs)
+        await smtp.connect()
+        if smtp.is_ehlo_or_helo_needed:
+            await smtp.ehlo()
+        if cached is None:
+            self._ehlo_cache[mx_server] = dict(smtp.esmtp_extensions)
+        return smtp
+
+    def _release_smtp(self, mx_server: str, smtp: aiosmtplib.SMTP):
+        self.smtp_pool.setdefault(mx_server, asyncio.Queue()).put_nowait(smtp)
+
+    @staticmethod
+    async def _discard_smtp(smtp: aiosmtplib.SMTP):
+        try:
+            await smtp.quit()
+        except Exception:
+            pass
+
+    async def close(self):
+        """Quit all pooled SMTP connections. Call once a batch job is done."""
+        for queue in self.smtp_pool.values():
+            while True:
+                try:
+                    smtp = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                await self._discard_smtp(smtp)
+        self.smtp_pool.clear()
 
     def check_syntax(self, email: str) -> bool:
         """Validates email format using regex."""
-        regex = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        return re.match(regex, email) is not None
+        return EMAIL_RE.match(email) is not None
 
     def is_disposable(self, domain: str) -> bool:
-        """Checks if the domain is a known disposable provider."""
-        return domain.lower() in DISPOSABLE_DOMAINS
+        """Checks if the domain (or any parent of it) is a known disposable
+        provider. Expects a lowercased domain."""
+        node = _DISPOSABLE_TRIE
+        for label in reversed(domain.split('.')):
+            node = node.get(label)
+            if node is None:
+                return False
+            if "_leaf" in node:
+                return True
+        return False
 
-    def is_role_account(self, email: str) -> bool:
-        """Checks if the email is a role-based account."""
-        local_part = email.split('@')[0].lower()
+    def is_role_account(self, local_part: str) -> bool:
+        """Checks if the local part is a role-based account. Expects it lowercased."""
         return local_part in ROLE_PREFIXES
 
+    def _cache_mx(self, domain: str, records: Optional[List[str]], ttl: float):
+        # Entries are (expiry, records); expired ones just read as misses.
+        self.mx_cache[domain] = (time.monotonic() + ttl, records)
+
+    @staticmethod
+    def _answer_ttl(records) -> float:
+        return min(getattr(records.rrset, 'ttl', MAX_MX_TTL), MAX_MX_TTL)
+
+    @staticmethod
+    async def _reap(task: asyncio.Task):
+        # Cancel a speculative task and consume its outcome so the loop
+        # doesn't log "exception was never retrieved"
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            pass
+
+    @staticmethod
+    async def _coalesce(inflight: Dict[str, asyncio.Future], key: str, coro_func):
+        """Run coro_func() for key, letting concurrent callers share the result."""
+        fut = inflight.get(key)
+        if fut is not None:
+            return await fut
+        fut = asyncio.get_running_loop().create_future()
+        inflight[key] = fut
+        try:
+            result = await coro_func()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as exc:
+            # Hand waiters the real error rather than a CancelledError, which
+            # would escape their except-Exception handlers and kill the job.
+            fut.set_exception(exc)
+            # Mark it retrieved now in case nobody is waiting; awaiting
+            # callers still get the exception raised.
+            fut.exception()
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            del inflight[key]
+            if not fut.done():
+                # Unusual teardown (BaseException): release any waiters
+                fut.cancel()
+
+    def _prefetch_mx_ip(self, mx_host: str):
+        # Resolve the MX host's A record in the background so the upcoming
+        # SMTP connect doesn't pay a third serial DNS round trip. Best-effort:
+        # on any failure open_connection just resolves the hostname itself.
+        entry = self._mx_ip.get(mx_host)
+        if entry and entry[0] > time.monotonic():
+            return
+
+        async def prefetch():
+            try:
+                answer = await self.resolver.resolve(mx_host, 'A')
+                self._mx_ip[mx_host] = (
+                    time.monotonic() + self._answer_ttl(answer), str(answer[0])
+                )
+            except Exception:
+                pass
+
+        asyncio.create_task(prefetch())
+
     async def get_mx_records(self, domain: str) -> Optional[List[str]]:
-        if domain in self.mx_cache:
-            return self.mx_cache[domain]
+        entry = self.mx_cache.get(domain)
+        if entry and entry[0] > time.monotonic():
+            records = entry[1]
+        else:
+            records = await self._coalesce(
+                self._mx_inflight, domain, lambda: self._resolve_mx(domain)
+            )
+        if records:
+            self._prefetch_mx_ip(records[0])
+        return records
+
+    async def _resolve_mx(self, domain: str) -> Optional[List[str]]:
+        # Fire the MX and A queries together: the A answer is only needed
+        # when there's no MX, and running them serially would pay two full
+        # DNS round trips in that (common for typo domains) worst case.
+        mx_task = asyncio.create_task(self.resolver.resolve(domain, 'MX'))
+        a_task = asyncio.create_task(self.resolver.resolve(domain, 'A'))
 
         try:
-            records = await asyncio.to_thread(self.resolver.resolve, domain, 'MX')
-            mx_records = [str(r.exchange).rstrip('.') for r in records]
-            self.mx_cache[domain] = sorted(mx_records)
-            return self.mx_cache[domain]
+            records = await mx_task
+            # to_text(omit_final_dot=True) converts and strips the trailing
+            # dot in one pass, instead of str() plus rstrip() per record
+            mx_records = sorted(r.exchange.to_text(omit_final_dot=True) for r in records)
+            # Positive answers are reusable for as long as the record's own TTL
+            self._cache_mx(domain, mx_records, self._answer_ttl(records))
+            return mx_records
         except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN, dns.resolver.NoNameservers):
+            # Negative verdicts get a short fixed TTL: typo domains shouldn't
+            # pile up forever, and a domain might gain MX records.
             try:
-                await asyncio.to_thread(self.resolver.resolve, domain, 'A')
-                self.mx_cache[domain] = [] # Domain exists but no MX
+                await a_task
+                self._cache_mx(domain, [], NEGATIVE_MX_TTL) # Domain exists but no MX
                 return []
-            except:
-                self.mx_cache[domain] = [] # Domain dead
+            except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN, dns.resolver.NoNameservers):
+                self._cache_mx(domain, [], NEGATIVE_MX_TTL) # Domain dead
                 return []
+            except (dns.exception.Timeout, socket.gaierror):
+                # Network flakiness, not a verdict: leave the negative cache
+                # alone so a retry can still resolve the domain.
+                return None
+            finally:
+                a_task = None
         except Exception as e:
             logger.warning(f"DNS lookup failed for {domain}: {e}")
             try:
-                sys_resolver = dns.resolver.Resolver() 
-                records = await asyncio.to_thread(sys_resolver.resolve, domain, 'MX')
-                mx_records = [str(r.exchange).rstrip('.') for r in records]
-                self.mx_cache[domain] = sorted(mx_records)
-                return self.mx_cache[domain]
-            except:
+                sys_resolver = dns.asyncresolver.Resolver()
+                records = await sys_resolver.resolve(domain, 'MX')
+                mx_records = sorted(r.exchange.to_text(omit_final_dot=True) for r in records)
+                self._cache_mx(domain, mx_records, self._answer_ttl(records))
+                return mx_records
+            except Exception:
+                # Transient network failure: do NOT cache, let a retry resolve
+                # it. Never a bare except here — CancelledError must propagate
+                # so shutdown can reap pending DNS coroutines promptly.
                 return None
+        finally:
+            # Whichever path returned, don't leave the speculative A query dangling
+            if a_task is not None:
+                await self._reap(a_task)
 
-    async def check_smtp(self, email: str, mx_server: str) -> dict:
+    @staticmethod
+    async def _read_pipelined_replies(smtp: aiosmtplib.SMTP, count: int) -> list:
+        """Read `count` replies after a pipelined write.
+
+        SMTPProtocol.read_response resolves its waiter with only the first
+        reply parsed from each received segment; a pipelining server normally
+        coalesces all replies into one segment, so the rest sit unparsed in
+        the protocol buffer and a second read_response would block until it
+        times out. Drain the buffer between awaits instead. Reply order is
+        preserved: anything parsed into the waiter always predates what is
+        still in the buffer.
+        """
+        protocol = smtp.protocol
+        replies: list = []
+        while len(replies) < count:
+            waiter = protocol._response_waiter
+            if waiter is None or not waiter.done():
+                reply = protocol._read_response_from_buffer()
+                if reply is not None:
+                    replies.append(reply)
+                    continue
+            replies.append(await protocol.read_response(timeout=TIMEOUT))
+        return replies
+
+    async def _pipelined_mail_rcpt(self, smtp: aiosmtplib.SMTP, email: str):
+        """Send MAIL FROM + RCPT TO + RSET and return the RCPT (code, message).
+
+        When the server advertises PIPELINING (RFC 2920) all three commands go
+        out in a single TCP write, saving two round trips per probe; otherwise
+        the commands are sent sequentially.
+        """
+        if smtp.supports_extension("pipelining") and smtp.protocol is not None:
+            smtp.protocol.write(
+                MAIL_FROM_LINE + f"RCPT TO:<{email}>\r\nRSET\r\n".encode("ascii")
+            )
+            mail_response, rcpt_response, _ = await self._read_pipelined_replies(smtp, 3)
+            if mail_response.code != 250:
+                raise aiosmtplib.SMTPResponseException(mail_response.code, mail_response.message)
+            return rcpt_response.code, rcpt_response.message
+
+        await smtp.mail(SENDER_EMAIL)
         try:
-            smtp = aiosmtplib.SMTP(hostname=mx_server, port=SMTP_PORT, timeout=TIMEOUT)
-            await smtp.connect()
-            await smtp.ehlo()
-            await smtp.mail(SENDER_EMAIL)
             code, message = await smtp.rcpt(email)
-            await smtp.quit()
-            
-            if code == 250:
-                return {"status": "VALID", "reason": "SMTP Response 250 OK"}
-            elif code == 550:
-                return {"status": "INVALID", "reason": "User Not Found (550)"}
+        except aiosmtplib.SMTPRecipientRefused as exc:
+            # rcpt() raises on hard rejections; surface the code so a 550
+            # classifies as INVALID here just like on the pipelined path
+            code, message = exc.code, exc.message
+        return code, message
+
+    @staticmethod
+    def _interpret_rcpt(code: int, message) -> dict:
+        if code == 250:
+            return {"status": "VALID", "reason": "SMTP Response 250 OK"}
+        elif code == 550:
+            return {"status": "INVALID", "reason": "User Not Found (550)"}
+        else:
+            return {"status": "UNKNOWN", "reason": f"SMTP Response {code}: {message}"}
+
+    async def _greylist_backoff(self, mx_server: str, attempt: int):
+        # Full jitter; if another probe already scheduled a backoff for this
+        # MX, wait for that deadline instead of stacking a fresh one.
+        delay = random.uniform(0, min(2 ** attempt, 8))
+        now = time.monotonic()
+        target = max(self._greylist_until.get(mx_server, 0.0), now + delay)
+        self._greylist_until[mx_server] = target
+        await asyncio.sleep(target - now)
+
+    async def _check_smtp_attempt(self, email: str, mx_server: str):
+        """One probe. Returns (verdict, transient): transient means a retry
+        might produce a definitive answer (greylisting 4xx or a timeout)."""
+        smtp = None
+        try:
+            smtp = await self._acquire_smtp(mx_server)
+            code, message = await self._pipelined_mail_rcpt(smtp, email)
+            # Connection stays open for the next probe to this MX
+            self._release_smtp(mx_server, smtp)
+            smtp = None
+
+            return self._interpret_rcpt(code, message), code in TRANSIENT_SMTP_CODES
+
+        except aiosmtplib.SMTPResponseException as e:
+            # Server answered, so the connection itself is still usable
+            if smtp is not None:
+                self._release_smtp(mx_server, smtp)
+                smtp = None
+            verdict = {"status": "UNKNOWN", "reason": f"SMTP Error {e.code}: {e.message}"}
+            return verdict, e.code in TRANSIENT_SMTP_CODES
+        except aiosmtplib.SMTPTimeoutError:
+             return {"status": "RISKY", "reason": "SMTP Connection Blocked"}, True
+        except (aiosmtplib.SMTPConnectError, aiosmtplib.SMTPServerDisconnected,
+                TimeoutError, ConnectionRefusedError):
+             return {"status": "RISKY", "reason": "SMTP Connection Blocked"}, False
+        except Exception as e:
+             return {"status": "UNKNOWN", "reason": f"SMTP Exception: {str(e)}"}, False
+        finally:
+            if smtp is not None:
+                await self._discard_smtp(smtp)
+
+    async def check_smtp(self, email: str, mx_server: str) -> dict:
+        # Greylisting MXes answer 4xx (or stall) on first contact; one jittered
+        # retry recovers a verdict. Hard 5xx rejections are never retried.
+        verdict, transient = await self._check_smtp_attempt(email, mx_server)
+        if transient:
+            await self._greylist_backoff(mx_server, 0)
+            verdict, _ = await self._check_smtp_attempt(email, mx_server)
+        return verdict
+
+    async def check_smtp_multi(self, emails: List[str], mx_server: str) -> List[dict]:
+        """Probe several recipients in one SMTP transaction on one connection.
+
+        Sends a single MAIL FROM followed by one RCPT TO per address (all in
+        one TCP write when the server supports PIPELINING) and interprets each
+        reply independently, so e.g. the catch-all probe and the real address
+        cost one RTT pair instead of two transactions. Like check_smtp,
+        transient 4xx/timeout replies get one jittered retry (only the
+        affected addresses are re-sent).
+        """
+        verdicts, transients = await self._check_smtp_multi_attempt(emails, mx_server)
+        if any(transients):
+            await self._greylist_backoff(mx_server, 0)
+            retry_idx = [i for i, transient in enumerate(transients) if transient]
+            retry_verdicts, _ = await self._check_smtp_multi_attempt(
+                [emails[i] for i in retry_idx], mx_server
+            )
+            for i, verdict in zip(retry_idx, retry_verdicts):
+                verdicts[i] = verdict
+        return verdicts
+
+    async def _check_smtp_multi_attempt(self, emails: List[str], mx_server: str):
+        """One multi-RCPT transaction. Returns (verdicts, transients) with a
+        per-address flag for replies a retry might turn definitive."""
+        smtp = None
+        try:
+            smtp = await self._acquire_smtp(mx_server)
+            if smtp.supports_extension("pipelining") and smtp.protocol is not None:
+                commands = MAIL_FROM_LINE + (
+                    "".join(f"RCPT TO:<{e}>\r\n" for e in emails) + "RSET\r\n"
+                ).encode("ascii")
+                smtp.protocol.write(commands)
+                # MAIL reply + one per RCPT + RSET reply, drained from the
+                # buffer even when the server coalesces them into one segment
+                replies = await self._read_pipelined_replies(smtp, len(emails) + 2)
+                mail_response = replies[0]
+                if mail_response.code != 250:
+                    raise aiosmtplib.SMTPResponseException(mail_response.code, mail_response.message)
+                codes = [(r.code, r.message) for r in replies[1:-1]]
             else:
-                 return {"status": "UNKNOWN", "reason": f"SMTP Response {code}: {message}"}
+                await smtp.mail(SENDER_EMAIL)
+                codes = []
+                for e in emails:
+                    try:
+                        code, message = await smtp.rcpt(e)
+                    except aiosmtplib.SMTPRecipientRefused as exc:
+                        code, message = exc.code, exc.message
+                    codes.append((code, message))
+                await smtp.rset()
+
+            self._release_smtp(mx_server, smtp)
+            smtp = None
+            return (
+                [self._interpret_rcpt(code, message) for code, message in codes],
+                [code in TRANSIENT_SMTP_CODES for code, _ in codes],
+            )
 
         except aiosmtplib.SMTPResponseException as e:
-            return {"status": "UNKNOWN", "reason": f"SMTP Error {e.code}: {e.message}"}
-        except (aiosmtplib.SMTPConnectError, aiosmtplib.SMTPTimeoutError, TimeoutError, ConnectionRefusedError):
-             return {"status": "RISKY", "reason": "SMTP Connection Blocked"}
+            if smtp is not None:
+                self._release_smtp(mx_server, smtp)
+                smtp = None
+            verdicts = [{"status": "UNKNOWN", "reason": f"SMTP Error {e.code}: {e.message}"}] * len(emails)
+            return verdicts, [e.code in TRANSIENT_SMTP_CODES] * len(emails)
+        except aiosmtplib.SMTPTimeoutError:
+            return ([{"status": "RISKY", "reason": "SMTP Connection Blocked"}] * len(emails),
+                    [True] * len(emails))
+        except (aiosmtplib.SMTPConnectError, aiosmtplib.SMTPServerDisconnected,
+                TimeoutError, ConnectionRefusedError):
+            return ([{"status": "RISKY", "reason": "SMTP Connection Blocked"}] * len(emails),
+                    [False] * len(emails))
         except Exception as e:
-             return {"status": "UNKNOWN", "reason": f"SMTP Exception: {str(e)}"}
+            return ([{"status": "UNKNOWN", "reason": f"SMTP Exception: {str(e)}"}] * len(emails),
+                    [False] * len(emails))
+        finally:
+            if smtp is not None:
+                await self._discard_smtp(smtp)
 
-    async def is_catch_all(self, domain: str, mx_server: str) -> bool:
-        if domain in self.catch_all_cache:
-            return self.catch_all_cache[domain]
-
-        random_prefix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=15))
-        test_email = f"{random_prefix}@{domain}"
-        
-        result = await self.check_smtp(test_email, mx_server)
-        
-        is_catch_all = (result['status'] == 'VALID')
-        self.catch_all_cache[domain] = is_catch_all
+    def _probe_address(self, domain: str) -> str:
+        self._probe_n += 1
+        return f"{self._probe_base}{self._probe_n:x}@{domain}"
+
+    def _cache_catch_all(self, domain: str, probe_verdict: dict) -> bool:
+        # Only definitive probe replies (250/550) are worth remembering; a
+        # transient 4xx or timeout verdict would stick a wrong catch-all flag
+        # on the domain for every later address.
+        is_catch_all = (probe_verdict['status'] == 'VALID')
+        if probe_verdict['status'] in ('VALID', 'INVALID'):
+            self.catch_all_cache[domain] = is_catch_all
         return is_catch_all
 
+    @staticmethod
+    def _apply_smtp_verdict(result: dict, smtp_result: dict) -> dict:
+        # Final Decision Logic
+        if smtp_result['status'] == "VALID":
+            # True Valid (server confirmed)
+            result["status"] = "VALID"
+            result["reason"] = "SMTP Valid"
+            result["smtp_valid"] = True
+
+        elif smtp_result['status'] == "INVALID":
+            # True Invalid (server rejected)
+            result["status"] = "INVALID"
+            result["reason"] = smtp_result["reason"]
+
+        elif smtp_result['status'] == "RISKY":
+            # This means PORT 25 BLOCKED (Render case)
+            # Since user wants VALID results for real domains, we upgrade here
+            # BUT we respect the Role-Based check from earlier
+
+            if result["status"] == "RISKY" and result["reason"] == "Role-Based Account":
+                # Keep as Risky
+                pass
+            else:
+                # Upgrade to Valid because SMTP is blocked, but domain is valid
+                # This ensures the frontend 'Cleaned List' download actually gets these emails
+                result["status"] = "VALID"
+                result["reason"] = "Valid Domain (SMTP Blocked by Render)"
+                result["smtp_valid"] = True
+
+        else:
+            # Unknown
+            result["status"] = "UNKNOWN"
+            result["reason"] = smtp_result["reason"]
+
+        return result
+
     async def verify(self, email: str) -> dict:
         result = {
             "email": email,
@@ -133,9 +618,9 @@ class EmailVerifier:
                 result["reason"] = "Invalid Syntax"
                 return result
             
-            try:
-                domain = email.split('@')[1].lower()
-            except IndexError:
+            # Split and lowercase once; the checkers expect normalized parts
+            local_part, _, domain = email.lower().partition('@')
+            if not domain:
                  result["status"] = "INVALID"
                  result["reason"] = "Invalid Format"
                  return result
@@ -147,7 +632,7 @@ class EmailVerifier:
                 return result
 
             # 3. Role-Based Check
-            if self.is_role_account(email):
+            if self.is_role_account(local_part):
                 result["status"] = "RISKY"
                 result["reason"] = "Role-Based Account"
                 # We continue checking to see if it's real, but default to RISKY if we can't confirm
@@ -168,45 +653,34 @@ class EmailVerifier:
             result["mx_found"] = True
             mx_server = mx_records[0]
 
-            # 5. Catch-All Check (Skip if we already flagged as role-based, we want to know connection status)
-            # Only check catch-all if we haven't failed already
-            
-            # 6. SMTP Check
-            smtp_result = await self.check_smtp(email, mx_server)
-            
-            # Final Decision Logic
-            if smtp_result['status'] == "VALID":
-                # True Valid (server confirmed)
-                result["status"] = "VALID"
-                result["reason"] = "SMTP Valid"
-                result["smtp_valid"] = True
-                
-            elif smtp_result['status'] == "INVALID":
-                # True Invalid (server rejected)
-                result["status"] = "INVALID"
-                result["reason"] = smtp_result["reason"]
-                
-            elif smtp_result['status'] == "RISKY":
-                # This means PORT 25 BLOCKED (Render case)
-                # Since user wants VALID results for real domains, we upgrade here
-                # BUT we respect the Role-Based check from earlier
-                
-                if result["status"] == "RISKY" and result["reason"] == "Role-Based Account":
-                    # Keep as Risky
-                    pass 
+            # 5+6. Catch-All + SMTP Check. When the domain's catch-all verdict
+            # isn't cached yet, probe a random address and the real one in a
+            # single SMTP transaction; otherwise only the real address is sent.
+            # Concurrent verifies for the same fresh domain share one probe
+            # through _catch_all_inflight instead of each firing their own.
+            inflight = self._catch_all_inflight.get(domain)
+            if domain in self.catch_all_cache or inflight is not None:
+                if inflight is not None:
+                    result["catch_all"] = self._cache_catch_all(domain, await inflight)
                 else:
-                    # Upgrade to Valid because SMTP is blocked, but domain is valid
-                    # This ensures the frontend 'Cleaned List' download actually gets these emails
-                    result["status"] = "VALID"
-                    result["reason"] = "Valid Domain (SMTP Blocked by Render)"
-                    result["smtp_valid"] = True
-                    
+                    result["catch_all"] = self.catch_all_cache[domain]
+                smtp_result = await self.check_smtp(email, mx_server)
             else:
-                 # Unknown
-                 result["status"] = "UNKNOWN"
-                 result["reason"] = smtp_result["reason"]
+                smtp_result = None
 
-            return result
+                async def fused_probe():
+                    nonlocal smtp_result
+                    probe_result, smtp_result = await self.check_smtp_multi(
+                        [self._probe_address(domain), email], mx_server
+                    )
+                    return probe_result
+
+                probe_result = await self._coalesce(
+                    self._catch_all_inflight, domain, fused_probe
+                )
+                result["catch_all"] = self._cache_catch_all(domain, probe_result)
+            
+            return self._apply_smtp_verdict(result, smtp_result)
             
         except Exception as e:
             logger.error(f"Unexpected error validating {email}: {e}", exc_info=True)
@@ -219,14 +693,107 @@ class EmailVerifier:
                 "catch_all": False
             }
 
+    async def _probe_domain_batch(self, domain: str, addresses: List[str],
+                                  mx_server: str):
+        """SMTP-probe all of a domain's addresses in one transaction.
+
+        Returns (verdicts, catch_all). When the domain's catch-all verdict
+        isn't cached yet the random probe rides along in the same transaction,
+        just like verify() does for a single address.
+        """
+        if domain in self.catch_all_cache:
+            verdicts = await self.check_smtp_multi(addresses, mx_server)
+            return verdicts, self.catch_all_cache[domain]
+
+        verdicts = await self.check_smtp_multi(
+            [self._probe_address(domain)] + addresses, mx_server
+        )
+        return verdicts[1:], self._cache_catch_all(domain, verdicts[0])
+
+    async def verify_many(self, emails, concurrency: int = 50) -> List[dict]:
+        """Verify a batch of addresses, grouped by domain.
+
+        One MX lookup per domain and one pooled SMTP session per MX host,
+        with all of a domain's RCPT probes pipelined in a single transaction
+        instead of one transaction per address. Results come back in input
+        order.
+        """
+        emails = list(emails)
+        results: List[Optional[dict]] = [None] * len(emails)
+        by_domain: Dict[str, List[tuple]] = defaultdict(list)
+
+        for idx, email in enumerate(emails):
+            result = {
+                "email": email,
+                "status": "UNKNOWN",
+                "reason": "",
+                "smtp_valid": False,
+                "mx_found": False,
+                "catch_all": False
+            }
+            if not self.check_syntax(email):
+                result["status"] = "INVALID"
+                result["reason"] = "Invalid Syntax"
+                results[idx] = result
+                continue
+
+            local_part, _, domain = email.lower().partition('@')
+            if self.is_disposable(domain):
+                result["status"] = "INVALID"
+                result["reason"] = "Disposable Domain"
+                results[idx] = result
+                continue
+            if self.is_role_account(local_part):
+                result["status"] = "RISKY"
+                result["reason"] = "Role-Based Account"
+            by_domain[domain].append((idx, email, result))
+
+        # One MX lookup per domain; the in-flight map dedupes any overlap
+        # with other callers.
+        domains = list(by_domain)
+        mx_lists = await asyncio.gather(*(self.get_mx_records(d) for d in domains))
+
+        sem = asyncio.Semaphore(concurrency)
+
+        async def run_batch(domain, entries, mx_server):
+            async with sem:
+                verdicts, catch_all = await self._probe_domain_batch(
+                    domain, [e for _, e, _ in entries], mx_server
+                )
+            for (idx, _, result), verdict in zip(entries, verdicts):
+                result["mx_found"] = True
+                result["catch_all"] = catch_all
+                results[idx] = self._apply_smtp_verdict(result, verdict)
+
+        tasks = []
+        for domain, mx_records in zip(domains, mx_lists):
+            entries = by_domain[domain]
+            if mx_records is None:
+                for idx, _, result in entries:
+                    result["status"] = "UNKNOWN"
+                    result["reason"] = "DNS Lookup Failed"
+                    results[idx] = result
+            elif not mx_records:
+                for idx, _, result in entries:
+                    result["status"] = "INVALID"
+                    result["reason"] = "No MX Records"
+                    results[idx] = result
+            else:
+                tasks.append(asyncio.create_task(
+                    run_batch(domain, entries, mx_records[0])
+                ))
+
+        if tasks:
+            await asyncio.gather(*tasks)
+        return results
+
 if __name__ == "__main__":
     # Test runner
     async def main():
         verifier = EmailVerifier()
         emails = ["test@gmail.com", "invalid-email-format", "non_existent_user_12345@google.com", "support@github.com"]
-        for email in emails:
-            print(f"Verifying {email}...")
-            res = await verifier.verify(email)
+        for res in await verifier.verify_many(emails):
             print(res)
+        await verifier.close()
 
     asyncio.run(main())
@@ -1,6 +1,7 @@
 from backend.database import SessionLocal, Job, Email, engine
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, select, text
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 import sys
 import os
 
@@ -9,32 +10,59 @@ sys.path.append(os.path.join(os.getcwd(), 'backend'))
 
 # Override DB URL to point to backup
 DATABASE_URL = "sqlite:///backend/emails.db.bak"
-engine_bak = create_engine(DATABASE_URL)
+# One-shot triage script: NullPool so the single connection is closed as soon
+# as the session is, instead of lingering in a pool we'll never reuse.
+engine_bak = create_engine(
+    DATABASE_URL, connect_args={"check_same_thread": False}, poolclass=NullPool
+)
 SessionBak = sessionmaker(bind=engine_bak)
 
+def ensure_indexes():
+    # Job.created_at isn't indexed in the model, so the ORDER BY below would
+    # full-scan a multi-GB backup. IF NOT EXISTS makes this a cheap no-op on
+    # every run after the first.
+    with engine_bak.begin() as conn:
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_jobs_created_at ON jobs(created_at DESC)"
+        ))
+
 def check_jobs():
     db = SessionBak()
     try:
-        # Get last 5 jobs
-        jobs = db.query(Job).order_by(Job.created_at.desc()).limit(5).all()
+        # Get last 5 jobs: column-only select, no need to hydrate ORM objects
+        jobs = db.execute(
+            select(Job.id, Job.status, Job.created_at, Job.completed_at,
+                   Job.processed_emails, Job.total_emails)
+            .order_by(Job.created_at.desc())
+            .limit(5)
+        ).all()
         for job in jobs:
             print(f"Job ID: {job.id}")
             print(f"  Status: {job.status}")
             print(f"  Created: {job.created_at}")
             print(f"  Completed: {job.completed_at}")
             print(f"  Progress: {job.processed_emails} / {job.total_emails}")
-            
+
             if job.status == 'FAILED' or job.id == jobs[0].id:
                 print("  Last 5 Emails:")
-                emails = db.query(Email).filter(Email.job_id == job.id).order_by(Email.id.desc()).limit(5).all()
+                # Streamed rather than buffered so a broad filter on a huge
+                # backup doesn't pull the whole result set into memory.
+                emails = db.execute(
+                    select(Email.email, Email.status, Email.reason)
+                    .where(Email.job_id == job.id)
+                    .order_by(Email.id.desc())
+                    .limit(5)
+                    .execution_options(stream_results=True, yield_per=100)
+                )
                 for email in emails:
                     print(f"    - {email.email}: {email.status} ({email.reason})")
             print("-" * 20)
-            
+
     except Exception as e:
         print(f"Error querying DB: {e}")
     finally:
         db.close()
 
 if __name__ == "__main__":
+    ensure_indexes()
     check_jobs()